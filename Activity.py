@@ -0,0 +1,129 @@
+import numpy as np
+
+
+class ActivityDetector:
+    """
+    block level voice activity detector, energy with hysteresis and hangover
+    """
+
+    def __init__(self, rate, on_level=100, off_level=50, hangover=0.3):
+        """
+        initialize the detector, levels are rms values in sample units (int16)
+
+        @param int rate: sampling rate
+        @param float on_level: a block louder than this starts the activity
+        @param float off_level: a block quieter than this counts as silence
+        @param float hangover: seconds of silence before the input is idle
+        """
+        if off_level > on_level:
+            raise Exception("off_level should be smaller or equal to on_level")
+        self.on_level = on_level
+        self.off_level = off_level
+        self.hangover = int(hangover * rate)
+        self.clear()
+
+    def update(self, x):
+        """
+        feed the next block to the detector
+
+        @param array_like x: sound inputs
+
+        @return bool active: False once the input has been quiet for hangover
+        """
+        x = np.asarray(x)
+        if x.dtype.kind != 'f':
+            x = x.astype(float)  # int16 squares would overflow
+        if len(x) == 0:
+            return self.active
+        rms = np.sqrt(np.dot(x, x) / len(x))
+
+        if rms >= self.on_level:
+            self.active = True
+            self.quiet = 0
+        elif rms < self.off_level:
+            self.quiet += len(x)
+            if self.quiet >= self.hangover:
+                self.active = False
+        # in between the two levels: keep the current state
+
+        return self.active
+
+    def clear(self):
+        self.active = False
+        self.quiet = self.hangover
+
+
+class IdleBypass:
+    """
+    wrap an effect so idle input costs (almost) nothing
+
+    while the input is active the effect runs as usual. once it goes idle the
+    input is treated as silence: the effect only runs on zeros until its delay
+    lines and filter states have rung out, then it is cleared and skipped.
+    max_tail is only a safety limit for effects that never ring out: the tail
+    is faded out over one block and the effect is cleared
+    """
+
+    def __init__(self, effect, detector=None, tail_level=1, max_tail=None):
+        """
+        @param Effect effect: the effect to wrap
+        @param ActivityDetector detector: optional, default detector if None
+        @param float tail_level: the effect is drained once its state is below
+        this level
+        @param float max_tail: optional, seconds after which the tail is faded
+        out anyway, default is 4 times the longest delay line of the effect (at
+        least 30 seconds, a feedback gain of 0.9 on a 0.2 second delay needs
+        about 20 seconds to ring out)
+        """
+        self.effect = effect
+        self.detector = ActivityDetector(effect.rate) if detector is None else detector
+        self.tail_level = tail_level
+        if max_tail is None:
+            longest = max((np.size(getattr(effect, name))
+                           for name in getattr(effect, 'state_attrs', ())), default=0)
+            max_tail = max(4 * longest / effect.rate, 30)
+        self.max_tail = int(max_tail * effect.rate)
+        # samples flushed since the input went idle
+        self.tail = 0
+        self.drained = True
+        # True when the last block did not run the effect
+        self.bypassed = True
+
+    @property
+    def latency(self):
+        return self.effect.latency
+
+    @property
+    def dtype(self):
+        return self.effect.dtype
+
+    def cal_output(self, x):
+        if self.detector.update(x):
+            self.drained = False
+            self.bypassed = False
+            self.tail = 0
+            return self.effect.cal_output(x)
+
+        self.bypassed = True
+        if self.drained:
+            return np.zeros(len(x), dtype=self.dtype)
+
+        # flush the tail, stop as soon as it is inaudible
+        output = self.effect.cal_output(np.zeros(len(x), dtype=self.dtype))
+        self.tail += len(x)
+        if self.effect.tail_level() < self.tail_level:
+            self.effect.clear()
+            self.drained = True
+        elif self.tail >= self.max_tail:
+            # the tail is still audible, fade it out instead of cutting it
+            output = output * np.linspace(1, 0, len(x), dtype=self.dtype)
+            self.effect.clear()
+            self.drained = True
+        return output
+
+    def clear(self):
+        self.effect.clear()
+        self.detector.clear()
+        self.tail = 0
+        self.drained = True
+        self.bypassed = True
@@ -1,13 +1,21 @@
-import inspect
-import sys
-
 import numpy as np
 from scipy import signal
 
+# the list of all the effects (built-in and plugins) lives in Registry, new
+# effects have to be registered there
+from Registry import effects_dict
+
 
 class Effect:
     # the default input argument (exclude rate), all should be float
     default_input = "frequency=200"
+    # delay (in samples) the effect adds between input and output
+    latency = 0
+    # attributes holding delay lines or filter states, see tail_level
+    state_attrs = ()
+    # sample type of the signal, the delay lines and the filter states, see
+    # set_dtype. fixed for an effect once it is created
+    dtype = np.dtype(np.float64)
 
     def __init__(self, frequency, rate):
         """
@@ -15,6 +23,7 @@ class Effect:
 
         @param np.array frequency: normalized frequency
         """
+        self.dtype = np.dtype(type(self).dtype)
         self.rate = rate
         self.frequency = frequency / int(self.rate/2)  # use nyquist frequency
         if isinstance(self.frequency, np.ndarray):
@@ -38,6 +47,45 @@ class Effect:
         """
         pass
 
+    @property
+    def complex_dtype(self):
+        """
+        complex type matching self.dtype (complex64 for float32)
+        """
+        return np.result_type(self.dtype, np.complex64)
+
+    def next_time(self, length):
+        """
+        sample indices of the next block, advance self.n by the block length
+
+        @param int length: number of samples in the block
+
+        @return np.array t: self.n, self.n + 1, ..., self.n + length - 1
+        """
+        t = np.arange(self.n, self.n + length)
+        self.n += length
+        return t
+
+    def tail_level(self):
+        """
+        largest magnitude left in the delay lines and filter states, the
+        effect has rung out when this is close to 0
+
+        @return float level: 0 if the effect has no state
+        """
+        return max((np.max(np.abs(getattr(self, name)), initial=0)
+                    for name in self.state_attrs), default=0)
+
+    def flush_denormals(self):
+        """
+        set the tiny values left in the states to 0. a filter state decaying in
+        silence would otherwise end up as subnormal numbers, which are very
+        slow to compute with (and come much sooner in float32)
+        """
+        for name in self.state_attrs:
+            state = getattr(self, name)
+            state[np.abs(state) < 1e-20] = 0
+
     def clear(self):
         """
         clear all values that would affect the reuse of the effect
@@ -46,39 +94,56 @@ class Effect:
         self.n = 0
 
 
+def set_dtype(dtype):
+    """
+    set the dtype policy: the sample type of the effects created afterwards.
+    np.float32 halves the memory traffic of the signal, delay lines and filter
+    states, complex effects then use complex64
+
+    @param dtype: np.float32 or np.float64
+
+    @return np.dtype previous: the previous policy
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise Exception("dtype should be float32 or float64")
+    previous = Effect.dtype
+    Effect.dtype = dtype
+    return previous
+
+
 class NoEffect(Effect):
     default_input = "# no tunable parameters"
 
     def cal_output(self, x):
-        return x
+        return np.asarray(x, dtype=self.dtype)
 
 
 class AM(Effect):
     def cal_output(self, x):
         # single input
         if isinstance(x, int):
-            output = x * np.cos(2 * np.pi * self.frequency * self.n)
-            self.n += 1
+            return self.cal_output(np.array([x]))[0]
         # block inputs
-        else:
-            output = np.zeros(len(x))
-            for i in range(len(x)):
-                output[i] = x[i] * np.cos(2 * np.pi * self.frequency * self.n)
-                self.n += 1
+        t = self.next_time(len(x))
+        carrier = np.cos(2 * np.pi * self.frequency * t).astype(self.dtype)
+        output = np.asarray(x, dtype=self.dtype) * carrier
 
         return output
 
 
 class ComplexAM(Effect):
     default_input = "frequency=200, order=6  # order should be between 1 to 10"
+    state_attrs = ('prev_states',)
 
     def __init__(self, frequency, rate, order=6):
         super().__init__(frequency, rate)
         # TODO: how to choose Rp, Rs, and edge for elliptic filter?
         b, a = signal.ellip(order, 0.2, 50, 0.48)
-        self.b = [b[i] * 1j ** i for i in range(len(b))]
-        self.a = [a[i] * 1j ** i for i in range(len(a))]
-        self.prev_states = np.zeros(order)
+        rotate = 1j ** np.arange(len(b))
+        self.b = (b * rotate).astype(self.complex_dtype)
+        self.a = (a * rotate).astype(self.complex_dtype)
+        self.prev_states = np.zeros(order, dtype=self.complex_dtype)
 
     def cal_output(self, x):
         """
@@ -91,12 +156,12 @@ class ComplexAM(Effect):
 
         # calculate complex output
         complex_output, self.prev_states = signal.lfilter(
-            self.b, self.a, x, zi=self.prev_states)
+            self.b, self.a, np.asarray(x, dtype=self.dtype), zi=self.prev_states)
+        self.flush_denormals()
         # shift the output
-        t = np.array([self.n + i for i in range(len(x))])  # calculate increment
+        t = self.next_time(len(x))
         complex_output = complex_output * np.exp(
-            1j * 2 * np.pi * self.frequency * t)
-        self.n += len(x)  # increment self.n
+            1j * 2 * np.pi * self.frequency * t).astype(self.complex_dtype)
         # take the real part
         output = np.real(complex_output)
 
@@ -104,11 +169,12 @@ class ComplexAM(Effect):
 
     def clear(self):
         super().clear()
-        self.prev_states = np.zeros(self.prev_states)
+        self.prev_states = np.zeros_like(self.prev_states)
 
 
 class Vibrato(Effect):
     default_input = "frequency=2, T=0.5, W=0.02  # T>=W, can be decimal"
+    state_attrs = ('buffer',)
 
     def __init__(self, frequency, rate, delay=0.5, vary_delay=0.02):
         """
@@ -123,48 +189,36 @@ class Vibrato(Effect):
         super().__init__(frequency, rate)
         self.T = int(delay * self.rate)
         self.W = int(vary_delay * self.rate)
-        # buffer
-        self.buffer = np.zeros(self.T + self.W)
-        # write index
-        self.kw = 0
+        # buffer, holds the last T + W inputs (oldest first)
+        self.buffer = np.zeros(self.T + self.W, dtype=self.dtype)
 
     def cal_output(self, x):
-        def cal_singe_output(single_input):
-            """
-            helper function for calculating single output
-
-            @param int single_input: single bit sound input
-            @return float output: single bit sound output
-            """
-            tau = self.T + self.W * np.sin(2 * np.pi * self.frequency * self.n)
-            kr_prev = int(np.floor(self.kw - tau))
-            frac = (self.kw - tau) - kr_prev
-            kr_prev %= len(self.buffer)
-            kr_next = (kr_prev + 1) % len(self.buffer)
-            output = (1 - frac) * self.buffer[kr_prev] + frac * self.buffer[kr_next]
-
-            # update buffer and time
-            self.buffer[self.kw] = single_input
-            self.kw = (self.kw + 1) % len(self.buffer)
-            self.n += 1
-
-            return output
-
         # single input
         if isinstance(x, int):
-            output = cal_singe_output(x)
+            return self.cal_output(np.array([x]))[0]
+
         # block inputs
-        else:
-            output = np.zeros(len(x))
-            for i in range(len(x)):
-                output[i] = cal_singe_output(x[i])
+        x = np.asarray(x, dtype=self.dtype)
+        L = len(self.buffer)
+        t = self.next_time(len(x))
+        tau = self.T + self.W * np.sin(2 * np.pi * self.frequency * t)
+        # delay of the two samples around (n - tau), wrapped into [1, L]
+        # the same way a ring buffer of length L would
+        prev = np.floor(-tau)
+        frac = (-tau - prev).astype(self.dtype)
+        d_prev = (-prev.astype(int) - 1) % L + 1
+        d_next = (d_prev - 2) % L + 1
+
+        history = np.concatenate((self.buffer, x))
+        idx = L + np.arange(len(x))
+        output = (1 - frac) * history[idx - d_prev] + frac * history[idx - d_next]
+        self.buffer = history[-L:]
 
         return output
 
     def clear(self):
         super().clear()
-        self.kw = 0
-        self.buffer = np.zeros(self.buffer)
+        self.buffer = np.zeros_like(self.buffer)
 
 
 class ButterWorth(Effect):
@@ -172,6 +226,7 @@ class ButterWorth(Effect):
     this is more like a wrapper for the scipy signal.butter function, for consistence we decide to make it into the child class of Effect
     """
     default_input = "frequency=200, order=5, btype='lowpass'"
+    state_attrs = ('prev_states',)
 
     def __init__(self, frequency, rate, order=5, btype='lowpass'):
         """
@@ -183,8 +238,10 @@ class ButterWorth(Effect):
         """
         super().__init__(frequency, rate)
 
-        self.b, self.a = signal.butter(order, self.frequency, btype)
-        self.prev_states = np.zeros(len(self.b) - 1)
+        # second order sections, the transfer function form is not accurate
+        # enough in float32
+        self.sos = signal.butter(order, self.frequency, btype, output='sos').astype(self.dtype)
+        self.prev_states = np.zeros((len(self.sos), 2), dtype=self.dtype)
 
     def cal_output(self, x):
         """
@@ -194,8 +251,11 @@ class ButterWorth(Effect):
 
         @return array_like output: the output of the filter
         """
-        output, self.prev_states = signal.lfilter(
-            self.b, self.a, x, zi=self.prev_states)
+        if len(x) == 0:
+            return np.zeros(0, dtype=self.dtype)  # sosfilt with zi rejects empty input
+        output, self.prev_states = signal.sosfilt(
+            self.sos, np.asarray(x, dtype=self.dtype), zi=self.prev_states)
+        self.flush_denormals()
 
         return output
 
@@ -226,118 +286,371 @@ class BPF(ButterWorth):
 
 
 class PP(Effect):
-    default_input = "a1=1, a2=1, b1=0.7, b2=0.7, c1=1, c2=1, delay_sec=0.2"
+    default_input = "frequency=200, a1=1, a2=1, b1=0.7, b2=0.7, c1=1, c2=1, delay_sec=0.2"
+    state_attrs = ('buffer1', 'buffer2')
 
-    def __init__(self, rate, frequency, a1=1, a2=1, b1=0.7, b2=0.7, c1=1, c2=1,
+    def __init__(self, frequency, rate, a1=1, a2=1, b1=0.7, b2=0.7, c1=1, c2=1,
                  delay_sec=0.2):
         super().__init__(frequency, rate)
 
         self.N = int(rate * delay_sec)
-        self.buffer1 = self.N * [0]
-        self.buffer2 = self.N * [0]
+        self.buffer1 = np.zeros(self.N, dtype=self.dtype)
+        self.buffer2 = np.zeros(self.N, dtype=self.dtype)
+        self.k = 0
         self.a1, self.a2 = a1, a2
         self.b1, self.b2 = b1, b2
         self.c1, self.c2 = c1, c2
 
     def cal_output(self, x):
-        k = 0
-        output1 = np.zeros(len(x))
-        output2 = np.zeros(len(x))
-        for i, x_i in enumerate(x):
-            x_i1 = x_i
-            x_i2 = x_i
-
-            u0_1 = self.a1 * x_i1 + self.b1 * self.buffer2[k]
-            u0_2 = self.a2 * x_i2 + self.b2 * self.buffer1[k]
-
-            y0_1 = self.a1 * x_i1 + self.c1 * self.buffer1[k]
-            y0_2 = self.a2 * x_i2 + self.c2 * self.buffer2[k]
-
-            self.buffer1[k] = u0_1
-            self.buffer2[k] = u0_2
-            k = (k + 1) % self.N
-            output1[i] = y0_1
-            output2[i] = y0_2
+        x = np.asarray(x, dtype=self.dtype)
+        output1 = np.zeros(len(x), dtype=self.dtype)
+        # process in chunks that never wrap around the delay line, so a chunk
+        # only reads values written by earlier chunks
+        start = 0
+        while start < len(x):
+            length = min(len(x) - start, self.N - self.k)
+            x_i = x[start:start + length]
+            buf1 = self.buffer1[self.k:self.k + length]
+            buf2 = self.buffer2[self.k:self.k + length]
+
+            u0_1 = self.a1 * x_i + self.b1 * buf2
+            u0_2 = self.a2 * x_i + self.b2 * buf1
+            output1[start:start + length] = self.a1 * x_i + self.c1 * buf1
+
+            self.buffer1[self.k:self.k + length] = u0_1
+            self.buffer2[self.k:self.k + length] = u0_2
+            self.k = (self.k + length) % self.N
+            start += length
 
         return output1
 
+    def clear(self):
+        super().clear()
+        self.buffer1 = np.zeros_like(self.buffer1)
+        self.buffer2 = np.zeros_like(self.buffer2)
+        self.k = 0
+
 
 class Echo(Effect):
     default_input = "frequency=200, dly_in_sec=0.2, gain=0.5"
+    state_attrs = ('buffer',)
 
     def __init__(self, frequency, rate, dly_in_sec=0.2, gain=0.5):
         super().__init__(frequency, rate)
         self.gain = gain
         self.dly_in_samp = int(dly_in_sec * rate)
-        self.buffer = np.zeros(self.dly_in_samp)
+        self.buffer = np.zeros(self.dly_in_samp, dtype=self.dtype)
         self.k = 0
 
     def cal_output(self, x):
-        output = np.zeros(len(x)).astype(int)
-        for i, x_i in enumerate(x):
-            y_i = int(x_i + self.gain * self.buffer[self.k])
-            output[i] = y_i
-            self.buffer[self.k] = y_i
-            self.k = (self.k + 1) % self.dly_in_samp
+        x = np.asarray(x, dtype=self.dtype)
+        output = np.zeros(len(x), dtype=self.dtype)
+        # chunks never wrap around the delay line (see PP)
+        start = 0
+        while start < len(x):
+            length = min(len(x) - start, self.dly_in_samp - self.k)
+            y_i = x[start:start + length] + \
+                self.gain * self.buffer[self.k:self.k + length]
+            output[start:start + length] = y_i
+            self.buffer[self.k:self.k + length] = y_i
+            self.k = (self.k + length) % self.dly_in_samp
+            start += length
 
         return output
 
+    def clear(self):
+        super().clear()
+        self.buffer = np.zeros_like(self.buffer)
+        self.k = 0
+
 
 class Alien(Effect):
-    default_input = "frequency=200, dly_in_sec=0.2, delay_gain=1"
+    default_input = "frequency=200, dly_in_sec=0.2, delay_gain=0.5  # delay_gain < 1"
+    state_attrs = ('buffer',)
 
-    def __init__(self, frequency, rate, dly_in_sec=0.2, delay_gain=1):
+    def __init__(self, frequency, rate, dly_in_sec=0.2, delay_gain=0.5):
+        """
+        @param float dly_in_sec: delay of the feedback in seconds
+        @param float delay_gain: feedback gain, |delay_gain| < 1 so the echoes
+        decay
+        """
+        if abs(delay_gain) >= 1:
+            raise ValueError("delay_gain should be between -1 and 1 (excluded)")
         super().__init__(frequency, rate)
 
         self.bufferLen = int(rate * dly_in_sec)
         self.delay_gain = delay_gain
+        self.buffer = np.zeros(self.bufferLen, dtype=self.dtype)
+        self.k = 0
 
     def cal_output(self, x):
-        output = np.zeros(len(x))
-        buffer = self.bufferLen * [0]
-        k = 0
-        for i, x_i in enumerate(x):
-            output[i] = x_i * np.cos(2 * np.pi * 0.6 * i) + self.delay_gain * buffer[k]
-            buffer[k] = output[i]
-            k = (k + 1) % len(buffer)
+        t = self.next_time(len(x))
+        modulated = np.asarray(x, dtype=self.dtype) * \
+            np.cos(2 * np.pi * 0.6 * t).astype(self.dtype)
+        output = np.zeros(len(x), dtype=self.dtype)
+        # chunks never wrap around the delay line (see PP)
+        start = 0
+        while start < len(x):
+            length = min(len(x) - start, self.bufferLen - self.k)
+            y_i = modulated[start:start + length] + \
+                self.delay_gain * self.buffer[self.k:self.k + length]
+            output[start:start + length] = y_i
+            self.buffer[self.k:self.k + length] = y_i
+            self.k = (self.k + length) % self.bufferLen
+            start += length
 
         return output
 
+    def clear(self):
+        super().clear()
+        self.buffer = np.zeros_like(self.buffer)
+        self.k = 0
+
 
 class Autobots(Effect):
     default_input = "frequency=200, low_freq=0.1, high_freq=0.2 # 0 < low_freq < high_freq < 1"
+    state_attrs = ('prev_states',)
 
     def __init__(self, frequency, rate, low_freq=0.1, high_freq=0.2):
         super().__init__(frequency, rate)
         self.cutoff_freq = [low_freq, high_freq]
+        # filtfilt needs the whole signal, so the band-pass is run forward
+        # twice instead: same magnitude response, but causal and streamable
+        sos = signal.butter(4, self.cutoff_freq, 'bandpass', output='sos')
+        self.sos = np.vstack((sos, sos)).astype(self.dtype)
+        self.prev_states = np.zeros((len(self.sos), 2), dtype=self.dtype)
 
     def cal_output(self, x):
-        b, a = signal.butter(4, self.cutoff_freq, 'bandpass')
-        
-        output = signal.filtfilt(b, a, x)
+        if len(x) == 0:
+            return np.zeros(0, dtype=self.dtype)
+        output, self.prev_states = signal.sosfilt(
+            self.sos, np.asarray(x, dtype=self.dtype), zi=self.prev_states)
+        self.flush_denormals()
         return output
 
+    def clear(self):
+        super().clear()
+        self.prev_states = np.zeros_like(self.prev_states)
+
+
 class Drunk(Effect):
     default_input = "frequency=200, delay_sec=0.2"
+    state_attrs = ('buffer',)
 
     def __init__(self, frequency, rate, delay_sec=0.2):
         super().__init__(frequency, rate)
         self.bufferLen = int(delay_sec * rate)
-        self.buffer = self.bufferLen * [0]
+        self.buffer = np.zeros(self.bufferLen, dtype=self.dtype)
+        self.k = 0
+
+    def cal_output(self, x):
+        x = np.asarray(x, dtype=self.dtype)
+        t = self.next_time(len(x))
+        modulated = x * (np.cos(t) + np.sin(t)).astype(self.dtype)
+        output = np.zeros(len(x), dtype=self.dtype)
+        # chunks never wrap around the delay line (see PP)
+        start = 0
+        while start < len(x):
+            length = min(len(x) - start, self.bufferLen - self.k)
+            output[start:start + length] = modulated[start:start + length] + \
+                self.buffer[self.k:self.k + length]
+            self.buffer[self.k:self.k + length] = x[start:start + length]
+            self.k = (self.k + length) % self.bufferLen
+            start += length
+
+        return output
+
+    def clear(self):
+        super().clear()
+        self.buffer = np.zeros_like(self.buffer)
         self.k = 0
 
+
+class PitchShift(Effect):
+    default_input = "frequency=200, ratio=1.5, formant=0, frame_len=512  # ratio > 0, formant=1 keeps the timbre"
+    state_attrs = ('in_buf', 'ola_tail', 'out_buf')
+
+    def __init__(self, frequency, rate, ratio=1.5, formant=0, frame_len=512):
+        """
+        streaming phase vocoder pitch shifter
+
+        every frame the true frequency of each bin is estimated from the phase
+        advance, the spectrum is moved up/down by ratio and the synthesis phase
+        is accumulated, then the frames are overlap-added with the same hop.
+        the output is delayed by exactly frame_len samples, whatever the block
+        size is
+
+        @param float ratio: pitch factor, 2 is one octave up, 0.5 one octave down
+        @param int formant: if non zero, keep the spectral envelope in place
+        @param int frame_len: fft length, must be a multiple of 4
+        """
+        if ratio <= 0:
+            raise Exception("ratio should be greater than 0")
+        if frame_len < 16 or frame_len % 4 != 0:
+            raise Exception("frame_len should be a multiple of 4 (at least 16)")
+        super().__init__(frequency, rate)
+        self.ratio = ratio
+        self.formant = bool(formant)
+        self.N = int(frame_len)
+        self.hop = self.N // 4
+        self.latency = self.N
+
+        # cached window and normalization for 75% overlap-add
+        window = signal.get_window('hann', self.N)
+        self.window = window.astype(self.dtype)
+        self.synth_window = (window * self.hop / np.sum(window ** 2)).astype(self.dtype)
+        # expected phase advance of every bin over one hop
+        n_bins = self.N // 2 + 1
+        self.omega = 2 * np.pi * np.arange(n_bins) / self.N
+        self.bins = np.arange(n_bins)
+        # the input bin every output bin takes its frequency from
+        self.src_near = np.minimum(np.round(self.bins / self.ratio).astype(int), n_bins - 1)
+        # spectral envelope (formant preservation): the cepstral order follows
+        # the pitch of every frame, searched between 400 Hz and 60 Hz
+        self.max_period = min(int(self.rate / 60), self.N // 2)
+        self.min_period = min(max(int(self.rate / 400), 2), self.max_period - 1)
+        self.quefrency = np.minimum(np.arange(self.N), self.N - np.arange(self.N))
+
+        self.clear()
+
+    def _envelope(self, mag):
+        """
+        true envelope of every frame: the cepstral smoothing is repeated on
+        max(spectrum, envelope) until the envelope goes through the harmonic
+        peaks, instead of averaging the peaks with the valleys between them.
+        the cepstral order is half the pitch period (found as the cepstrum
+        peak), the finest envelope the harmonics can follow
+
+        @param np.array mag: magnitude spectra, one frame per row
+        @return np.array envelope: same shape as mag
+        """
+        log_mag = np.log(mag + 1e-9)
+        # the smoothing rings on deep notches, keep 40 dB below the frame peak
+        log_mag = np.maximum(log_mag, np.max(log_mag, axis=1, keepdims=True) - 40 / 20 * np.log(10))
+
+        cep = np.fft.irfft(log_mag, n=self.N, axis=1)
+        period = self.min_period + np.argmax(cep[:, self.min_period:self.max_period], axis=1)
+        order = np.clip(period // 2, 1, max(self.N // 8, 1))
+        lifter = self.quefrency < order[:, None]
+
+        # a frame stops once its envelope is within 2 dB of every bin, frame by
+        # frame so the result does not depend on the block size
+        tolerance = 2 / 20 * np.log(10)
+        target = log_mag
+        for _ in range(40):
+            envelope = np.fft.rfft(np.fft.irfft(target, n=self.N, axis=1) * lifter, axis=1).real
+            active = np.max(log_mag - envelope, axis=1) >= tolerance
+            if not active.any():
+                break
+            target = np.where(active[:, None], np.maximum(log_mag, envelope), target)
+        return np.exp(envelope)
+
+    def _nearest_peak(self, mag):
+        """
+        index of the closest spectral peak for every bin
+
+        @param np.array mag: magnitude spectra, one frame per row
+        @return np.array peak: same shape as mag
+        """
+        n_bins = mag.shape[1]
+        bins = np.broadcast_to(self.bins, mag.shape)
+        is_peak = np.zeros(mag.shape, dtype=bool)
+        is_peak[:, 1:-1] = (mag[:, 1:-1] > mag[:, :-2]) & (mag[:, 1:-1] >= mag[:, 2:])
+        # closest peak on the left and on the right of every bin
+        left = np.maximum.accumulate(np.where(is_peak, bins, -n_bins), axis=1)
+        right = np.minimum.accumulate(
+            np.where(is_peak, bins, 2 * n_bins)[:, ::-1], axis=1)[:, ::-1]
+        peak = np.where(bins - left <= right - bins, left, right)
+        # frames without any peak keep their own phase
+        return np.where((peak < 0) | (peak >= n_bins), bins, peak)
+
+    def _process_frames(self, frames):
+        """
+        pitch shift a stack of analysis frames
+
+        the region around every spectral peak is moved as a whole to the
+        shifted peak bin, so the bins keep their phase relation to the peak
+
+        @param np.array frames: one frame per row, consecutive frames are
+        one hop apart
+        @return np.array output: windowed synthesis frames
+        """
+        spectrum = np.fft.rfft(frames * self.window, axis=1)
+        mag = np.abs(spectrum)
+        phase = np.angle(spectrum)
+
+        # true frequency of every bin from the phase advance between frames
+        dphi = np.diff(np.vstack((self.prev_phase, phase)), axis=0)
+        dphi -= self.hop * self.omega
+        dphi -= 2 * np.pi * np.round(dphi / (2 * np.pi))
+        true_freq = self.omega + dphi / self.hop
+        self.prev_phase = phase[-1]
+
+        # accumulate the synthesis phase of every output bin across frames
+        acc_phase = self.syn_phase + np.cumsum(
+            self.hop * self.ratio * true_freq[:, self.src_near], axis=0)
+        self.syn_phase = np.mod(acc_phase[-1], 2 * np.pi)
+
+        if self.formant:
+            envelope = self._envelope(mag)
+            mag = mag / envelope
+
+        # move every bin by the shift of its closest peak
+        n_bins = mag.shape[1]
+        rows = np.broadcast_to(np.arange(len(frames))[:, None], mag.shape)
+        peak = self._nearest_peak(mag)
+        new_peak = np.minimum(np.round(peak * self.ratio).astype(int), n_bins)
+        target = self.bins + new_peak - peak
+        valid = (target >= 0) & (target < n_bins) & (new_peak < n_bins)
+        new_peak = new_peak[valid]
+        rows, target = rows[valid], target[valid]
+
+        new_mag = np.zeros_like(mag)
+        new_phase = np.zeros_like(phase)
+        new_mag[rows, target] = mag[valid]
+        new_phase[rows, target] = acc_phase[rows, new_peak] + phase[valid] - \
+            phase[rows, peak[valid]]
+        if self.formant:
+            new_mag *= envelope
+
+        spectrum = new_mag * np.exp(1j * new_phase).astype(self.complex_dtype)
+        output = np.fft.irfft(spectrum, n=self.N, axis=1)
+        return output.astype(self.dtype, copy=False) * self.synth_window
+
     def cal_output(self, x):
-        output = np.zeros(x.shape[0])
-        for i, x_i in enumerate(x):
-            y_i = x_i * np.cos(i) + x_i * np.sin(i) + self.buffer[self.k]
-            output[i] = y_i
-            self.buffer[self.k] = x_i
-            self.k = (self.k + 1) % self.bufferLen
+        x = np.asarray(x, dtype=self.dtype).reshape(-1)
+        buffer = np.concatenate((self.in_buf, x))
+        n_frames = (len(buffer) - self.N) // self.hop + 1 if len(buffer) >= self.N else 0
+
+        if n_frames > 0:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, self.N)[::self.hop][:n_frames]
+            synth = self._process_frames(frames)
+
+            # overlap-add, the frames are split into hop sized pieces
+            acc = np.zeros((n_frames + 3) * self.hop, dtype=self.dtype)
+            acc[:self.N - self.hop] = self.ola_tail
+            pieces = synth.reshape(n_frames, 4, self.hop)
+            for r in range(4):
+                acc[r * self.hop:(r + n_frames) * self.hop] += pieces[:, r, :].reshape(-1)
+            self.ola_tail = acc[n_frames * self.hop:]
+            self.out_buf = np.concatenate((self.out_buf, acc[:n_frames * self.hop]))
+            self.in_buf = buffer[n_frames * self.hop:]
+        else:
+            self.in_buf = buffer
+
+        output = self.out_buf[:len(x)]
+        self.out_buf = self.out_buf[len(x):]
+        self.n += len(x)
 
         return output
 
-# get a list of all the effects
-effects_dict = dict(inspect.getmembers(sys.modules[__name__], inspect.isclass))
-# remove abstract class from the list
-del effects_dict[Effect.__name__]
-del effects_dict[ButterWorth.__name__]
+    def clear(self):
+        super().clear()
+        n_bins = self.N // 2 + 1
+        # the phases stay in float64 whatever the dtype, they accumulate
+        self.prev_phase = np.zeros(n_bins)
+        self.syn_phase = np.zeros(n_bins)
+        # history of the next frame, and output that is ready but not sent yet
+        self.in_buf = np.zeros(self.N - self.hop, dtype=self.dtype)
+        self.ola_tail = np.zeros(self.N - self.hop, dtype=self.dtype)
+        self.out_buf = np.zeros(self.hop, dtype=self.dtype)
@@ -0,0 +1,288 @@
+import multiprocessing as mp
+import pickle
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class Chain:
+    """
+    run several effects one after the other, behaves like a single effect
+    """
+
+    def __init__(self, effects):
+        """
+        @param list effects: Effect objects, applied in order
+        """
+        self.effects = list(effects)
+
+    @property
+    def latency(self):
+        return sum(effect.latency for effect in self.effects)
+
+    @property
+    def dtype(self):
+        return self.effects[0].dtype
+
+    def cal_output(self, x):
+        for effect in self.effects:
+            x = effect.cal_output(x)
+        return x
+
+    def clear(self):
+        for effect in self.effects:
+            effect.clear()
+
+
+POLL_INTERVAL = 0.1  # seconds between checks that the workers are alive
+
+
+def _thread_stage(effect, in_queue, out_queue):
+    """
+    worker of one pipeline stage, None is passed down to stop the pipeline.
+    an exception raised by the effect takes the place of its block and is
+    passed down as well, the worker keeps running
+    """
+    while True:
+        x = in_queue.get()
+        if x is None:
+            out_queue.put(None)
+            break
+        if isinstance(x, Exception):
+            out_queue.put(x)
+            continue
+        try:
+            out_queue.put(effect.cal_output(x))
+        except Exception as e:
+            out_queue.put(e)
+
+
+def _picklable(e):
+    """
+    the exception itself if it can go through a multiprocessing queue, else
+    its repr in a plain Exception
+    """
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return Exception(repr(e))
+
+
+def _process_stage(effect, blocklen, dtype, in_edge, out_edge):
+    """
+    worker of one pipeline stage running in its own process
+
+    blocks are passed through shared memory slots, the queues only carry
+    (slot, length) pairs. an edge is (shm name, n_slots, ready queue, free queue)
+    """
+    in_name, in_slots, in_ready, in_free = in_edge
+    out_name, out_slots, out_ready, out_free = out_edge
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    in_buf = np.ndarray((in_slots, blocklen), dtype=dtype, buffer=in_shm.buf)
+    out_buf = np.ndarray((out_slots, blocklen), dtype=dtype, buffer=out_shm.buf)
+
+    while True:
+        item = in_ready.get()
+        if item is None:
+            out_ready.put(None)
+            break
+        if isinstance(item, Exception):
+            out_ready.put(item)
+            continue
+        slot, length = item
+        x = in_buf[slot, :length].copy()
+        in_free.put(slot)
+
+        try:
+            y = effect.cal_output(x)
+            if len(y) != length:
+                raise Exception("the stage returned %d samples for %d" % (len(y), length))
+        except Exception as e:
+            out_ready.put(_picklable(e))
+            continue
+
+        slot = out_free.get()  # blocks while the next stage is behind
+        out_buf[slot, :length] = y
+        out_ready.put((slot, length))
+
+    del in_buf, out_buf
+    in_shm.close()
+    out_shm.close()
+
+
+class PipelineExecutor:
+    """
+    run the stages of an effect chain in parallel, one worker per stage
+
+    while stage i works on block k, stage i + 1 works on block k - 1 and so
+    on. the price is delay_blocks blocks of extra latency: cal_output returns
+    the output of the block passed delay_blocks calls earlier (zeros at the
+    start). the stages are connected with bounded queues, so a slow stage
+    blocks the caller instead of piling up blocks. an exception raised by a
+    stage is raised by the cal_output call that would have returned its block
+    """
+
+    def __init__(self, stages, delay_blocks=None, queue_size=2,
+                 use_processes=False, blocklen=1024):
+        """
+        @param list stages: Effect (or Chain) objects, applied in order
+        @param int delay_blocks: optional, blocks of extra latency, default is
+        one block per stage after the first, which keeps every stage busy
+        @param int queue_size: maximum number of blocks waiting between stages
+        @param bool use_processes: run the stages in processes instead of
+        threads, the blocks are handed over through shared memory
+        @param int blocklen: maximum block length, only used with processes
+        """
+        self.stages = list(stages)
+        if not self.stages:
+            raise Exception("the pipeline needs at least one stage")
+        self.delay_blocks = len(self.stages) - 1 if delay_blocks is None else delay_blocks
+        if self.delay_blocks < 0:
+            raise Exception("delay_blocks should be greater or equal to 0")
+        self.use_processes = use_processes
+        self.blocklen = blocklen
+        # blocks are handed over in the sample type of the first stage
+        self.dtype = np.dtype(self.stages[0].dtype)
+        self.in_flight = 0
+        self.last_len = 0
+
+        if use_processes:
+            self._start_processes(queue_size)
+        else:
+            self._start_threads(queue_size)
+
+    def _start_threads(self, queue_size):
+        # the output queue also holds the blocks delayed by delay_blocks, so
+        # it is left unbounded (it never holds more than delay_blocks + 1)
+        self.queues = [queue.Queue(maxsize=queue_size)
+                       for _ in range(len(self.stages))] + [queue.Queue()]
+        self.workers = [threading.Thread(target=_thread_stage,
+                                         args=(stage, self.queues[i], self.queues[i + 1]),
+                                         daemon=True)
+                        for i, stage in enumerate(self.stages)]
+        for worker in self.workers:
+            worker.start()
+
+    def _start_processes(self, queue_size):
+        # every edge needs room for the blocks queued on it, plus the one the
+        # producer is writing and the one the consumer is reading; the output
+        # edge also holds the blocks delayed by delay_blocks
+        self.shms = []
+        self.edges = []
+        for i in range(len(self.stages) + 1):
+            n_slots = queue_size + 2
+            if i == len(self.stages):
+                n_slots += self.delay_blocks
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=n_slots * self.blocklen * self.dtype.itemsize)
+            free = mp.Queue()
+            for slot in range(n_slots):
+                free.put(slot)
+            self.shms.append(shm)
+            self.edges.append((shm.name, n_slots, mp.Queue(), free))
+        self.bufs = [np.ndarray((edge[1], self.blocklen), dtype=self.dtype, buffer=shm.buf)
+                     for edge, shm in zip(self.edges, self.shms)]
+
+        self.workers = [mp.Process(target=_process_stage,
+                                   args=(stage, self.blocklen, self.dtype,
+                                         self.edges[i], self.edges[i + 1]),
+                                   daemon=True)
+                        for i, stage in enumerate(self.stages)]
+        for worker in self.workers:
+            worker.start()
+
+    @property
+    def latency(self):
+        """
+        total delay in samples, the stages' own latency plus the pipeline
+        delay (counted with the length of the last block)
+        """
+        return sum(stage.latency for stage in self.stages) + \
+            self.delay_blocks * self.last_len
+
+    def _wait(self, method, *args):
+        """
+        call a blocking queue method, raise instead of blocking forever once a
+        worker is dead
+        """
+        while True:
+            try:
+                return method(*args, timeout=POLL_INTERVAL)
+            except (queue.Empty, queue.Full):
+                if not all(worker.is_alive() for worker in self.workers):
+                    raise Exception("a pipeline stage stopped unexpectedly")
+
+    def _put(self, x):
+        if self.use_processes:
+            if len(x) > self.blocklen:
+                raise Exception("block longer than blocklen=%d" % self.blocklen)
+            _, _, ready, free = self.edges[0]
+            slot = self._wait(free.get)
+            self.bufs[0][slot, :len(x)] = x
+            ready.put((slot, len(x)))
+        else:
+            self._wait(self.queues[0].put, np.array(x, dtype=self.dtype))
+
+    def _get(self):
+        if self.use_processes:
+            _, _, ready, free = self.edges[-1]
+            item = self._wait(ready.get)
+            if isinstance(item, Exception):
+                raise item
+            slot, length = item
+            y = self.bufs[-1][slot, :length].copy()
+            free.put(slot)
+            return y
+        y = self._wait(self.queues[-1].get)
+        if isinstance(y, Exception):
+            raise y
+        return y
+
+    def cal_output(self, x):
+        self.last_len = len(x)
+        self._put(x)
+        self.in_flight += 1
+        if self.in_flight <= self.delay_blocks:
+            # the pipeline is still filling up
+            return np.zeros(len(x), dtype=self.dtype)
+        self.in_flight -= 1
+        return self._get()
+
+    def close(self):
+        """
+        stop the workers, the blocks still in the pipeline (and their errors)
+        are dropped
+        """
+        try:
+            if self.use_processes:
+                self.edges[0][2].put(None)
+                # drain the output so no stage is stuck waiting for a free slot
+                _, _, ready, free = self.edges[-1]
+                item = self._wait(ready.get)
+                while item is not None:
+                    if not isinstance(item, Exception):
+                        free.put(item[0])
+                    item = self._wait(ready.get)
+            else:
+                self._wait(self.queues[0].put, None)
+                while self._wait(self.queues[-1].get) is not None:
+                    pass
+            stopped = True
+        except Exception:
+            stopped = False
+
+        for worker in self.workers:
+            if not stopped and self.use_processes:
+                worker.terminate()
+            # a thread stuck behind a dead stage cannot be stopped, it is a
+            # daemon and is left behind
+            worker.join(None if stopped else POLL_INTERVAL)
+        if self.use_processes:
+            del self.bufs
+            for shm in self.shms:
+                shm.close()
+                shm.unlink()
@@ -0,0 +1,98 @@
+import threading
+import time
+import wave
+
+import numpy as np
+
+
+class SessionRecorder:
+    """
+    record a live session to a WAV file without slowing down the audio loop
+
+    write() only copies the block into a preallocated int16 ring, a background
+    thread moves what is ready to the file in large chunks. if the disk falls
+    behind and the ring is full, the block is dropped and counted in
+    self.dropped instead of waiting
+    """
+
+    def __init__(self, path, rate, dry=False, ring_len=1 << 16, max_blocklen=4096,
+                 poll_interval=0.05):
+        """
+        @param str path: WAV file to write
+        @param int rate: sampling rate
+        @param bool dry: also record the dry input, as the second channel
+        @param int ring_len: ring length in samples, bounds the memory in use
+        @param int max_blocklen: longest block write() accepts
+        @param float poll_interval: seconds the writer sleeps when idle
+        """
+        self.channels = 2 if dry else 1
+        self.poll_interval = poll_interval
+        self.ring = np.zeros((ring_len, self.channels), dtype='<i2')
+        # float scratch so the clipping does not allocate
+        self.scratch = np.zeros(max_blocklen)
+        # samples written by the audio thread and samples saved by the writer
+        # thread, each counter is only changed by its own thread
+        self.write_count = 0
+        self.read_count = 0
+        self.dropped = 0
+
+        self.file = open(path, 'wb', buffering=1 << 20)
+        self.wav = wave.open(self.file, 'wb')
+        self.wav.setnchannels(self.channels)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(rate)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def _copy(self, channel, x, start):
+        length = len(x)
+        np.clip(x, -32768, 32767, out=self.scratch[:length])
+        # the block may wrap around the end of the ring
+        first = min(length, len(self.ring) - start)
+        self.ring[start:start + first, channel] = self.scratch[:first]
+        self.ring[:length - first, channel] = self.scratch[first:length]
+
+    def write(self, y, x=None):
+        """
+        queue a block for recording, never blocks
+
+        @param array_like y: processed output
+        @param array_like x: dry input, only recorded if dry=True
+        """
+        if self.write_count - self.read_count + len(y) > len(self.ring):
+            self.dropped += 1
+            return
+        start = self.write_count % len(self.ring)
+        self._copy(0, y, start)
+        if self.channels == 2:
+            self._copy(1, x, start)
+        self.write_count += len(y)
+
+    def _flush(self):
+        # write everything that is ready, in at most two chunks (before and
+        # after the end of the ring)
+        while self.read_count < self.write_count:
+            start = self.read_count % len(self.ring)
+            end = min(len(self.ring), start + self.write_count - self.read_count)
+            self.wav.writeframesraw(self.ring[start:end].tobytes())
+            self.read_count += end - start
+
+    def _writer(self):
+        while self.running:
+            self._flush()
+            time.sleep(self.poll_interval)
+        self._flush()
+
+    def stop(self):
+        """
+        write what is left, fix up the WAV header and close the file
+
+        @return int dropped: number of blocks dropped because the disk was late
+        """
+        self.running = False
+        self.thread.join()
+        self.wav.close()  # writes the final sizes in the header
+        self.file.close()
+        return self.dropped
@@ -0,0 +1,84 @@
+import importlib
+from importlib import metadata
+
+# entry point group third-party packages use to register their effects, e.g.
+# [project.entry-points."voice_changer.effects"]
+# Robot = "my_package.effects:Robot"
+ENTRY_POINT_GROUP = 'voice_changer.effects'
+
+# built-in effects, name -> "module:attribute"
+BUILTIN_EFFECTS = {
+    'AM': 'Effects:AM',
+    'Alien': 'Effects:Alien',
+    'Autobots': 'Effects:Autobots',
+    'BPF': 'Effects:BPF',
+    'ComplexAM': 'Effects:ComplexAM',
+    'Drunk': 'Effects:Drunk',
+    'Echo': 'Effects:Echo',
+    'HPF': 'Effects:HPF',
+    'LPF': 'Effects:LPF',
+    'NoEffect': 'Effects:NoEffect',
+    'PP': 'Effects:PP',
+    'PitchShift': 'Effects:PitchShift',
+    'Vibrato': 'Effects:Vibrato',
+}
+
+
+class EffectEntry:
+    """
+    lazy reference to an effect class, the module that defines it (and scipy
+    with it) is only imported when the effect is used
+
+    calling the entry creates the effect, like calling the class would
+    """
+
+    def __init__(self, name, target):
+        """
+        @param str name: name shown to the user
+        @param str target: "module:attribute" of the effect class
+        """
+        self.name = name
+        self.target = target
+        self._cls = None
+
+    def load(self):
+        """
+        import the effect class
+
+        @return type cls: the effect class
+        """
+        if self._cls is None:
+            module, _, attr = self.target.partition(':')
+            self._cls = getattr(importlib.import_module(module), attr)
+        return self._cls
+
+    @property
+    def default_input(self):
+        return self.load().default_input
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return "EffectEntry(%r, %r)" % (self.name, self.target)
+
+
+def register(name, target):
+    """
+    add an effect to the registry, replaces any effect with the same name
+
+    @param str name: name shown to the user
+    @param str target: "module:attribute" of the effect class
+    """
+    effects_dict[name] = EffectEntry(name, target)
+
+
+def _load_entry_points():
+    for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        register(entry_point.name, entry_point.value)
+
+
+effects_dict = {}
+for _name, _target in BUILTIN_EFFECTS.items():
+    register(_name, _target)
+_load_entry_points()
@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import Activity
+import Registry
+
+# every message is a header (type: uint8, payload length: uint32, network byte
+# order) followed by the payload
+HEADER = struct.Struct('!BI')
+MAX_PAYLOAD = 1 << 20
+# message types
+HELLO = 1  # client -> server, json, see EffectServer._create_effect
+READY = 2  # server -> client, json {"latency": samples}
+AUDIO = 3  # both ways, mono int16 little endian pcm
+ERROR = 4  # server -> client, utf-8 message, the connection is closed after it
+# an AUDIO block is answered by exactly one AUDIO block; a bad message or an
+# effect error is answered by ERROR instead
+
+
+async def read_message(reader):
+    """
+    read one message
+
+    @param asyncio.StreamReader reader: stream to read from
+    @return tuple (kind, payload): message type and payload bytes, raise
+    asyncio.IncompleteReadError at the end of the stream
+    """
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_PAYLOAD:
+        raise ValueError("payload of %d bytes is too large" % length)
+    return kind, await reader.readexactly(length)
+
+
+def write_message(writer, kind, payload):
+    """
+    queue one message on the stream, await writer.drain() to apply backpressure
+
+    @param asyncio.StreamWriter writer: stream to write to
+    @param int kind: message type
+    @param bytes payload: message payload
+    """
+    writer.write(HEADER.pack(kind, len(payload)))
+    writer.write(payload)
+
+
+def encode(y):
+    """
+    clip the effect output and turn it into int16 pcm
+
+    @param array_like y: effect output
+    @return bytes pcm: little endian int16 samples
+    """
+    return np.clip(y, -32768, 32767).astype('<i2').tobytes()
+
+
+def decode(pcm, dtype=np.float64):
+    """
+    @param bytes pcm: little endian int16 samples
+    @param dtype: sample type of the result, should match the effect
+    @return np.array x: samples as dtype
+    """
+    return np.frombuffer(pcm, dtype='<i2').astype(dtype)
+
+
+class EffectServer:
+    """
+    stream blocks through an effect for every client connection
+
+    each connection gets its own effect object. the DSP runs in a thread pool
+    so the event loop never blocks, and every connection has a bounded queue of
+    received blocks: once it is full the server stops reading that socket,
+    which pushes back on the client through TCP
+    """
+
+    def __init__(self, workers=4, queue_size=4):
+        """
+        @param int workers: number of DSP threads shared by all connections
+        @param int queue_size: maximum number of blocks waiting per connection
+        """
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.queue_size = queue_size
+        self.connections = 0
+        self.blocks = 0
+
+    @staticmethod
+    def _create_effect(config):
+        """
+        build the effect described by the HELLO message, e.g.
+        {"effect": "Echo", "args": [200, 0.3], "kwargs": {}, "rate": 8000,
+         "bypass_idle": false}
+        args are the arguments shown in Effect.default_input, frequency first
+
+        @param dict config: decoded HELLO payload
+        @return: effect object
+        """
+        if config.get('effect') not in Registry.effects_dict:
+            raise ValueError("unknown effect %r" % config.get('effect'))
+        effect_class = Registry.effects_dict[config['effect']]
+        args = list(config.get('args', [200]))
+        rate = config.get('rate', 8000)
+        effect = effect_class(args[0], rate, *args[1:], **config.get('kwargs', {}))
+        if config.get('bypass_idle', False):
+            effect = Activity.IdleBypass(effect)
+        return effect
+
+    async def _read_blocks(self, reader, blocks, dtype):
+        """
+        put the received blocks in the queue, then None at the end of the
+        stream, or the ValueError of a bad message in its place
+        """
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind != AUDIO:
+                    raise ValueError("unexpected message type %d" % kind)
+                if len(payload) == 0 or len(payload) % 2:
+                    raise ValueError("AUDIO payload of %d bytes, expected a non-empty "
+                                     "even length" % len(payload))
+                await blocks.put(decode(payload, dtype))  # waits while the queue is full
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await blocks.put(None)
+        except ValueError as e:
+            await blocks.put(e)
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        self.connections += 1
+        reader_task = None
+        try:
+            try:
+                kind, payload = await read_message(reader)
+                if kind != HELLO:
+                    raise ValueError("the first message should be HELLO")
+                config = json.loads(payload)
+                # creating the effect may import scipy, keep it off the loop
+                effect = await loop.run_in_executor(self.pool, self._create_effect, config)
+            except asyncio.IncompleteReadError:
+                return
+            except Exception as e:
+                write_message(writer, ERROR, str(e).encode())
+                await writer.drain()
+                return
+
+            write_message(writer, READY, json.dumps({'latency': effect.latency}).encode())
+            await writer.drain()
+
+            blocks = asyncio.Queue(maxsize=self.queue_size)
+            reader_task = asyncio.create_task(self._read_blocks(reader, blocks, effect.dtype))
+            try:
+                while True:
+                    x = await blocks.get()
+                    if x is None:
+                        break
+                    if isinstance(x, ValueError):
+                        raise x
+                    y = await loop.run_in_executor(self.pool, effect.cal_output, x)
+                    write_message(writer, AUDIO, encode(y))
+                    await writer.drain()
+                    self.blocks += 1
+            except ConnectionError:
+                raise
+            except Exception as e:
+                # a bad message from the client, or an error of the effect
+                write_message(writer, ERROR, ('%s: %s' % (type(e).__name__, e)).encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if reader_task is not None:
+                reader_task.cancel()
+            self.connections -= 1
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        """
+        start listening
+
+        @param str host: TCP host, ignored if path is given
+        @param int port: TCP port, 0 picks a free port
+        @param str path: optional, listen on this unix socket instead of TCP
+        @return asyncio.Server server: the listening server
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path=path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def serve(host, port, path, workers, queue_size):
+    server = await EffectServer(workers, queue_size).start(host, port, path)
+    if path is None:
+        host, port = server.sockets[0].getsockname()[:2]
+        print('listening on %s:%d' % (host, port), flush=True)
+    else:
+        print('listening on %s' % path, flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='voice changer effect server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='0 picks a free port')
+    parser.add_argument('--unix', default=None, help='listen on a unix socket instead')
+    parser.add_argument('--workers', type=int, default=4, help='DSP threads')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='blocks buffered per connection')
+    parser.add_argument('--dtype', default=None, choices=['float32', 'float64'],
+                        help='sample type of the effects (dtype policy)')
+    args = parser.parse_args()
+    if args.dtype is not None:
+        import Effects
+        Effects.set_dtype(args.dtype)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.queue_size))
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,5 @@
-import struct
 import re
+import time
 
 import PySimpleGUI as sg
 import numpy as np
@@ -7,10 +7,14 @@ import pyaudio
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, FigureCanvasAgg
 from matplotlib.figure import Figure
 
-import Effects
+import Activity
+import Recorder
+import Registry
 
 # sound properties
 BLOCKLEN = 1024  # Number of frames per block
+LOW_LATENCY_BLOCKLEN = 64  # Number of frames per block in low latency mode
+PLOT_LEN = 1024  # Number of samples shown in the plot
 WIDTH = 2  # Bytes per sample
 CHANNELS = 1  # Number of channels
 RATE = 8000  # Sampling rate in Hz (samples/second)
@@ -18,20 +22,45 @@ RATE = 8000  # Sampling rate in Hz (samples/second)
 open_sound = False
 
 
+def open_stream(p, blocklen):
+    """
+    open a stopped full duplex stream whose host buffer matches the block length
+
+    @param pyaudio.PyAudio p: pyaudio instance
+    @param int blocklen: number of frames per block
+    @return: pyaudio stream
+    """
+    return p.open(format=p.get_format_from_width(WIDTH),
+                  channels=CHANNELS,
+                  rate=RATE,
+                  input=True,
+                  output=True,
+                  frames_per_buffer=blocklen,
+                  start=False)  # turn off at first
+
+
 def play_effects(window):
     # pysimplegui window passed in
 
     # ------------pyaudio setup--------------
     # Open the audio output stream
     p = pyaudio.PyAudio()
-    stream = p.open(format=p.get_format_from_width(WIDTH),
-                    channels=CHANNELS,
-                    rate=RATE,
-                    input=True,
-                    output=True,
-                    frames_per_buffer=256,
-                    start=False)  # turn off at first
+    blocklen = BLOCKLEN
+    stream = open_stream(p, blocklen)
     play_sound = False
+    recorder = None
+
+    def stop_recording(recorder):
+        """
+        stop the recorder (if any) and tell the user if blocks were dropped
+        @return: None, so the caller can reset its recorder
+        """
+        if recorder is not None:
+            dropped = recorder.stop()
+            if dropped:
+                sg.popup('%d blocks could not be recorded, the disk was too slow' % dropped,
+                         title='WARNING', keep_on_top=True, non_blocking=True)
+        return None
 
     # keep an original copy of the play button color if color changed
     original_play_color = window['play_but'].ButtonColor
@@ -39,7 +68,7 @@ def play_effects(window):
     # ------------plotting setup--------------
     frequency_domain = True
     f_x_limit = [0, RATE / 2]  # frequency domain y limit
-    t_x_limit = [0, BLOCKLEN]  # time domain y limit
+    t_x_limit = [0, PLOT_LEN]  # time domain y limit
     f_y_limit = [0, RATE * 20]
     t_y_limit = [-32768, 32767]
 
@@ -65,14 +94,18 @@ def play_effects(window):
         ax.set_xlim(t_x_limit)
         ax.set_ylim(t_y_limit)
     # else: no, need to do nothing
-    x_data = RATE / BLOCKLEN * np.arange(BLOCKLEN)
+    x_data = RATE / PLOT_LEN * np.arange(PLOT_LEN)
+    # the plot shows the last PLOT_LEN output samples and is redrawn once
+    # every PLOT_LEN samples, whatever the block length is
+    plot_buffer = np.zeros(PLOT_LEN)
+    plot_count = 0
     fig_agg = FigureCanvasTkAgg(fig, window['-CANVAS-'].TKCanvas)
     fig_agg.draw()
     fig_agg.get_tk_widget().pack(side='top', fill='both', expand=1)
 
     # ------------effect setup--------------
     # display default input arguments in the input bar
-    effect_class = Effects.effects_dict[window['effect_dropdown'].get()]
+    effect_class = Registry.effects_dict[window['effect_dropdown'].get()]
     window['input_parameters'].update(effect_class.default_input)
 
     def update_effect(change_input, old_effect=None):
@@ -83,7 +116,7 @@ def play_effects(window):
         @return: Effect object
         """
         # get class type and input parameters in string
-        effect_class = Effects.effects_dict[window['effect_dropdown'].get()]
+        effect_class = Registry.effects_dict[window['effect_dropdown'].get()]
         if change_input:  # change value in input bar
             attrs = effect_class.default_input
             window['input_parameters'].update(effect_class.default_input)
@@ -106,10 +139,11 @@ def play_effects(window):
         if attr_list:
             try:
                 new_effect = effect_class(attr_list[0], RATE, *attr_list[1:])
-                return new_effect
-            except TypeError as te:  # user input incorrect
+                # skip the processing while nobody is speaking
+                return Activity.IdleBypass(new_effect)
+            except Exception as e:  # user input incorrect (or out of range)
                 sg.popup(
-                    str(te),
+                    str(e),
                     title='ERROR',
                     keep_on_top=True, button_color=('white', 'red'),
                     grab_anywhere=True,
@@ -143,6 +177,7 @@ def play_effects(window):
             stream.stop_stream()
             stream.close()
             p.terminate()
+            recorder = stop_recording(recorder)
             if event == 'back_start_but':
                 # reset visibility
                 window['menu'].update(visible=True)
@@ -165,10 +200,25 @@ def play_effects(window):
 
                 # start streaming
                 stream.stop_stream()
+                recorder = stop_recording(recorder)
             else:  # before was stopped, now need to play
                 effect = update_effect(change_input=False, old_effect=effect)
                 play_sound = True
 
+                # reopen the stream if the latency mode changed
+                new_blocklen = LOW_LATENCY_BLOCKLEN if window[
+                    'low_latency_c'].get() else BLOCKLEN
+                if new_blocklen != blocklen:
+                    blocklen = new_blocklen
+                    stream.close()
+                    stream = open_stream(p, blocklen)
+
+                # record the session to a new file in the working directory
+                if window['record_c'].get():
+                    recorder = Recorder.SessionRecorder(
+                        time.strftime('session_%Y%m%d_%H%M%S.wav'), RATE,
+                        dry=True)
+
                 # change display text
                 window['play_but'].update('Stop')
                 window['play_but'].update(button_color='red')
@@ -195,30 +245,45 @@ def play_effects(window):
             plot_type = 'n'
 
         if play_sound:
-            input_bytes = stream.read(BLOCKLEN, exception_on_overflow=False)
-            x = np.array(struct.unpack('h' * BLOCKLEN, input_bytes))
-
-            # get output
-            y = effect.cal_output(x) * (
-                    window['gain_slider'].TKIntVar.get() / 100)
-
-            # Convert numeric list to binary data
-            y = np.clip(np.array(y, np.int), -32768, 32767)
-            output_bytes = struct.pack('h' * BLOCKLEN, *y)
-
-            # Write binary data to audio output stream
-            stream.write(output_bytes, BLOCKLEN)
+            gain = window['gain_slider'].TKIntVar.get() / 100
+            # process every full block that is already available, so short
+            # blocks do not pay for one GUI update each
+            n_blocks = max(1, stream.get_read_available() // blocklen)
+            for _ in range(n_blocks):
+                input_bytes = stream.read(blocklen, exception_on_overflow=False)
+                x = np.frombuffer(input_bytes, dtype=np.int16).astype(effect.dtype)
+
+                # get output
+                y = effect.cal_output(x) * gain
+
+                # Convert numeric array to binary data
+                y = np.clip(y, -32768, 32767)
+                output_bytes = y.astype(np.int16).tobytes()
+
+                # Write binary data to audio output stream
+                stream.write(output_bytes, blocklen)
+                if recorder is not None:
+                    recorder.write(y, x)
+
+                # keep the latest samples for plotting, the plot is frozen
+                # while the input is idle
+                if not effect.bypassed:
+                    plot_buffer = np.roll(plot_buffer, -blocklen)
+                    plot_buffer[-blocklen:] = y[-PLOT_LEN:]
+                    plot_count += blocklen
 
             # update plot
-            ax.cla()  # clear the subplot
-            ax.grid()  # draw the grid
-            if plot_type == 'f':
-                ax.set_xlim(f_x_limit)
-                ax.set_ylim(f_y_limit)
-                ax.plot(x_data, np.abs(np.fft.fft(y)), color='purple')
-            elif plot_type == 't':
-                ax.set_xlim(t_x_limit)
-                ax.set_ylim(t_y_limit)
-                ax.plot(y, color='purple')
-
-            fig_agg.draw()
+            if plot_count >= PLOT_LEN:
+                plot_count = 0
+                ax.cla()  # clear the subplot
+                ax.grid()  # draw the grid
+                if plot_type == 'f':
+                    ax.set_xlim(f_x_limit)
+                    ax.set_ylim(f_y_limit)
+                    ax.plot(x_data, np.abs(np.fft.fft(plot_buffer)), color='purple')
+                elif plot_type == 't':
+                    ax.set_xlim(t_x_limit)
+                    ax.set_ylim(t_y_limit)
+                    ax.plot(plot_buffer, color='purple')
+
+                fig_agg.draw()
@@ -1,16 +1,6 @@
-import sys
-import traceback
-import time
-import os
-import platform
-import inspect
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, FigureCanvasAgg
-from matplotlib.figure import Figure
-
 import PySimpleGUI as sg
 
-import Effects
-import UI_effects
+import Registry
 
 # constant setup
 # default element size
@@ -35,7 +25,7 @@ HELP_TEXT_SIZE = (int(BUTTON_SIZE[0] * 0.8), 0)
 
 def main(theme='Python'):
     # effects list
-    effects_list = list(Effects.effects_dict.keys())
+    effects_list = list(Registry.effects_dict.keys())
 
     # set GUI theme
     sg.theme(theme)
@@ -65,6 +55,9 @@ def main(theme='Python'):
     effect_dropdown = sg.Combo(effects_list, key='effect_dropdown',
                                default_value=effects_list[0], readonly=True,
                                size=(int(BUTTON_W * 0.6)), enable_events=True)
+    low_latency_check = sg.Checkbox('low latency', key='low_latency_c',
+                                    default=False)
+    record_check = sg.Checkbox('record', key='record_c', default=False)
     apply_but = sg.Button('Apply', key='apply_but',
                           size=(int(BUTTON_W / 3), int(BUTTON_H / 2)))
     input_parameters = sg.Input(key='input_parameters',
@@ -102,7 +95,8 @@ def main(theme='Python'):
                                button_color=BACK_COLOR)
 
     start_menu = sg.Column(key='start_menu',
-                           layout=[[play_but, effect_dropdown],
+                           layout=[[play_but, effect_dropdown,
+                                    low_latency_check, record_check],
                                    [apply_but, input_parameters, apply_enter],
                                    [start_slider_frame, start_plot_frame],
                                    [back_start_but]], element_justification='c',
@@ -123,6 +117,10 @@ def main(theme='Python'):
                   "You can show the sound signal in time domain and frequency" \
                   "domain. If the voice sound laggy, choose no to turn off" \
                   "plotting might help.\n" \
+                  "Check low latency before pressing Play to process the " \
+                  "sound in short blocks (8 ms instead of 128 ms).\n" \
+                  "Check record before pressing Play to save the output and " \
+                  "the input to session_<date>_<time>.wav.\n" \
                   "\n\n>>> Help\n" \
                   "This is the help menu you are looking at.\n" \
                   "\n\n>>> Exit\n" \
@@ -160,6 +158,9 @@ def main(theme='Python'):
             menu.update(visible=False)
             start_menu.update(visible=True)
             try:
+                # imported here: matplotlib, pyaudio and the effects are only
+                # needed once the start menu is opened
+                import UI_effects
                 UI_effects.play_effects(window)
             except Exception as e:
                 # popup error message
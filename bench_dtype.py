@@ -0,0 +1,71 @@
+import sys
+import time
+
+import numpy as np
+from scipy import signal
+
+import Effects
+import Registry
+
+# float32 output compared with float64 output of the same effect
+MIN_SNR = 60  # dB
+# the phase vocoder picks spectral peaks, float32 rounding can flip a pick and
+# change the phases of a frame without changing how it sounds, so only its
+# long-term spectrum is compared
+MAX_SPECTRUM_DIFF = 0.5  # dB
+PHASE_VOCODER = ('PitchShift',)
+RATE = 8000
+BLOCKLEN = 1024
+
+
+def make(name, dtype):
+    previous = Effects.set_dtype(dtype)
+    try:
+        if name == 'BPF':
+            return Registry.effects_dict[name](200, RATE, 1000)
+        return Registry.effects_dict[name](200, RATE)
+    finally:
+        Effects.set_dtype(previous)
+
+
+def spectrum(y):
+    """
+    long-term power spectrum in dB
+    """
+    return 10 * np.log10(np.mean(np.abs(signal.stft(y, nperseg=256)[2][1:]) ** 2, axis=1))
+
+
+def run(effect, blocks):
+    start = time.perf_counter()
+    output = [effect.cal_output(block) for block in blocks]
+    return np.concatenate(output), time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    # noise bursts at speech level, half a second every second
+    rng = np.random.default_rng(0)
+    n = 80 * BLOCKLEN
+    x = rng.standard_normal(n) * 3000 * (np.arange(n) % RATE < RATE / 2)
+    blocks = np.round(x).reshape(-1, BLOCKLEN)
+
+    failed = False
+    print('%-11s %9s %9s %9s %9s %9s' % ('effect', 'SNR dB', 'max LSB', 'spec dB',
+                                         'f64 ms', 'f32 ms'))
+    for name in Registry.effects_dict:
+        y64, t64 = run(make(name, np.float64), blocks)
+        y32, t32 = run(make(name, np.float32), blocks.astype(np.float32))
+
+        error = y32.astype(float) - y64
+        snr = 10 * np.log10(np.sum(y64 ** 2) / max(np.sum(error ** 2), 1e-30))
+        spectrum_diff = np.max(np.abs(spectrum(y32.astype(float)) - spectrum(y64)))
+        if name in PHASE_VOCODER:
+            ok = spectrum_diff <= MAX_SPECTRUM_DIFF
+        else:
+            ok = snr >= MIN_SNR
+        ok &= y32.dtype == np.float32
+        failed |= not ok
+        print('%-11s %9.1f %9.2f %9.2f %9.1f %9.1f  %s'
+              % (name, snr, np.max(np.abs(error)), spectrum_diff, t64 * 1000, t32 * 1000,
+                 'ok' if ok else 'FAILED (%s)' % y32.dtype))
+
+    sys.exit(1 if failed else 0)
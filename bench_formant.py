@@ -0,0 +1,73 @@
+import sys
+
+import numpy as np
+
+import Effects
+
+# PitchShift with formant=1 should move the harmonics and keep the spectral
+# envelope: synthetic vowels are shifted and the amplitude of every shifted
+# harmonic is compared with the vowel's envelope at its new frequency
+MAX_RMS_ERROR = 4  # dB, over the shifted harmonics
+MAX_ERROR = 10  # dB, worst harmonic
+RATE = 8000
+FORMANTS = ((700, 130), (1200, 150), (2600, 250))  # (frequency, bandwidth) in Hz
+CASES = ((200, 0.8), (200, 1.25), (150, 1.5), (150, 0.7), (120, 1.5), (250, 0.7),
+         (100, 2.0), (220, 0.6))  # (f0 in Hz, ratio)
+
+
+def envelope(freqs):
+    """
+    magnitude response of a cascade of resonators, one per formant
+    """
+    z = np.exp(-2j * np.pi * np.asarray(freqs) / RATE)
+    response = np.ones_like(z)
+    for freq, bandwidth in FORMANTS:
+        pole = np.exp(-np.pi * bandwidth / RATE + 2j * np.pi * freq / RATE)
+        response /= (1 - pole * z) * (1 - np.conj(pole) * z)
+    return np.abs(response)
+
+
+def amplitudes(y, freqs):
+    """
+    amplitude of every sinusoid of freqs in y, least squares fit
+    """
+    phase = 2 * np.pi * freqs[None, :] * np.arange(len(y))[:, None] / RATE
+    coef = np.linalg.lstsq(np.hstack((np.cos(phase), np.sin(phase))), y, rcond=None)[0]
+    return np.hypot(coef[:len(freqs)], coef[len(freqs):])
+
+
+def envelope_error(f0, ratio, formant):
+    """
+    @return np.array error: level of every shifted harmonic above the envelope in dB
+    """
+    harmonics = f0 * np.arange(1, int((RATE / 2 - 50) // f0) + 1)
+    gain = 3000 / np.sqrt(np.sum(envelope(harmonics) ** 2) / 2)  # speech level
+    rng = np.random.default_rng(0)
+    t = np.arange(3 * RATE) / RATE
+    x = np.sum(gain * envelope(harmonics)[:, None] *
+               np.cos(2 * np.pi * harmonics[:, None] * t + rng.uniform(0, 2 * np.pi, (len(harmonics), 1))),
+               axis=0)
+
+    effect = Effects.PitchShift(200, RATE, ratio, formant)
+    y = np.concatenate([effect.cal_output(block) for block in np.array_split(x, len(x) // 1024)])
+
+    shifted = harmonics * ratio
+    shifted = shifted[shifted < RATE / 2 - 50]
+    # skip the first second, the start and the latency
+    return 20 * np.log10(amplitudes(y[RATE:], shifted) / (gain * envelope(shifted)))
+
+
+if __name__ == '__main__':
+    failed = False
+    print('%-6s %6s %11s %11s %11s' % ('f0 Hz', 'ratio', 'rms dB', 'max dB', 'formant=0'))
+    for f0, ratio in CASES:
+        error = envelope_error(f0, ratio, 1)
+        rms = np.sqrt(np.mean(error ** 2))
+        rms_off = np.sqrt(np.mean(envelope_error(f0, ratio, 0) ** 2))
+
+        ok = rms <= MAX_RMS_ERROR and np.max(np.abs(error)) <= MAX_ERROR and rms < rms_off
+        failed |= not ok
+        print('%-6d %6.2f %11.1f %11.1f %11.1f  %s' % (f0, ratio, rms, np.max(np.abs(error)),
+                                                      rms_off, 'ok' if ok else 'FAILED'))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import Server
+
+
+async def connect(host, port, path, config):
+    """
+    open a connection and wait until the server has created the effect
+
+    @param dict config: HELLO payload
+    @return tuple (reader, writer): the streams of the connection
+    """
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    Server.write_message(writer, Server.HELLO, json.dumps(config).encode())
+    await writer.drain()
+    kind, payload = await Server.read_message(reader)
+    if kind != Server.READY:
+        raise Exception(payload.decode())
+    return reader, writer
+
+
+async def stream(reader, writer, rate, n_blocks, blocklen, realtime, in_flight):
+    """
+    stream n_blocks of noise through the server and time every round trip
+
+    @param bool realtime: send the blocks at the audio rate instead of as fast
+    as possible
+    @param int in_flight: maximum number of blocks sent and not answered yet,
+    more than the server's queue size fills its queue and exercises the
+    backpressure
+    @return list latencies: round trip time of every block in seconds
+    """
+    pcm = (np.random.randn(blocklen) * 3000).astype('<i2').tobytes()
+    sent = []
+    window = asyncio.Semaphore(in_flight)
+
+    async def send():
+        start = time.perf_counter()
+        for i in range(n_blocks):
+            if realtime:
+                await asyncio.sleep(max(0, start + i * blocklen / rate - time.perf_counter()))
+            await window.acquire()
+            sent.append(time.perf_counter())
+            Server.write_message(writer, Server.AUDIO, pcm)
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    latencies = []
+    for i in range(n_blocks):
+        kind, payload = await Server.read_message(reader)
+        if kind != Server.AUDIO:
+            raise Exception(payload.decode())
+        latencies.append(time.perf_counter() - sent[i])
+        window.release()
+    await sender
+    writer.close()
+    return latencies
+
+
+async def run(args, host, port):
+    config = {'effect': args.effect, 'rate': args.rate}
+    # creating the first effect imports scipy on the server, keep it out of
+    # the measurement: the clock starts once every client got READY
+    connections = await asyncio.gather(*[connect(host, port, args.unix, config)
+                                         for _ in range(args.clients)])
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        stream(reader, writer, args.rate, args.blocks, args.blocklen, args.realtime,
+               args.in_flight)
+        for reader, writer in connections])
+    elapsed = time.perf_counter() - start
+
+    latencies = np.concatenate(results) * 1000
+    audio_time = args.clients * args.blocks * args.blocklen / args.rate
+    print('%d clients x %d blocks of %d samples, effect %s, %d in flight'
+          % (args.clients, args.blocks, args.blocklen, args.effect, args.in_flight))
+    print('round trip: p50 %.2f ms, p99 %.2f ms, max %.2f ms'
+          % (np.percentile(latencies, 50), np.percentile(latencies, 99), latencies.max()))
+    print('throughput: %.0f blocks/s, %.1fx real time'
+          % (len(latencies) / elapsed, audio_time / elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='load generator for Server.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help='server port, a local server is started if not given')
+    parser.add_argument('--unix', default=None, help='connect to a unix socket instead')
+    parser.add_argument('--effect', default='Echo')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--blocks', type=int, default=200)
+    parser.add_argument('--blocklen', type=int, default=1024)
+    parser.add_argument('--rate', type=int, default=8000)
+    parser.add_argument('--realtime', action='store_true',
+                        help='send at the audio rate instead of as fast as possible')
+    parser.add_argument('--in-flight', type=int, default=1,
+                        help='blocks sent ahead of the replies, above the server '
+                             '--queue-size the backpressure kicks in')
+    args = parser.parse_args()
+
+    server = None
+    host, port = args.host, args.port
+    if port is None and args.unix is None:
+        # start a server on a free local port in its own process
+        server = subprocess.Popen([sys.executable, 'Server.py', '--port', '0'],
+                                  stdout=subprocess.PIPE, text=True)
+        host, port = server.stdout.readline().split()[-1].rsplit(':', 1)
+        port = int(port)
+    try:
+        asyncio.run(run(args, host, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
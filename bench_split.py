@@ -0,0 +1,57 @@
+import sys
+
+import numpy as np
+
+import Registry
+
+# the output of an effect should not depend on how its input is cut into
+# blocks: every effect runs once on the whole signal, then on random splits
+# (empty blocks included) and on 1-sample blocks, and the outputs are compared
+MAX_ERROR = 1e-6  # in int16 sample units
+RATE = 8000
+N_SAMPLES = 2 * RATE
+N_SPLITS = 3
+
+
+def make(name):
+    if name == 'BPF':
+        return Registry.effects_dict[name](200, RATE, 1000)
+    return Registry.effects_dict[name](200, RATE)
+
+
+def run(effect, x, bounds):
+    output = [effect.cal_output(x[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+    return np.concatenate(output)
+
+
+def random_bounds(rng, n):
+    """
+    block boundaries for blocks of 0 to 2047 samples
+    """
+    lengths = rng.integers(0, 2048, size=2 * n // 1024 + 2)
+    bounds = np.minimum(np.concatenate(([0], np.cumsum(lengths))), n)
+    return np.append(bounds[bounds < n], n)
+
+
+if __name__ == '__main__':
+    # noise bursts at speech level, half a second every second
+    rng = np.random.default_rng(0)
+    x = np.round(rng.standard_normal(N_SAMPLES) * 3000 * (np.arange(N_SAMPLES) % RATE < RATE / 2))
+
+    failed = False
+    print('%-11s %12s %12s' % ('effect', 'random max', '1-sample max'))
+    for name in Registry.effects_dict:
+        reference = make(name).cal_output(x)
+        random_error = 0
+        for _ in range(N_SPLITS):
+            y = run(make(name), x, random_bounds(rng, N_SAMPLES))
+            random_error = max(random_error, np.max(np.abs(y - reference)))
+        y = run(make(name), x, np.arange(N_SAMPLES + 1))
+        sample_error = np.max(np.abs(y - reference))
+
+        ok = max(random_error, sample_error) <= MAX_ERROR
+        failed |= not ok
+        print('%-11s %12.3g %12.3g  %s' % (name, random_error, sample_error,
+                                           'ok' if ok else 'FAILED'))
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,76 @@
+import subprocess
+import sys
+
+# startup budget in ms, checked by this benchmark
+IMPORT_BUDGET = {
+    'Registry': 100,  # what headless tools and the main menu pay up front
+}
+FIRST_BLOCK_BUDGET = 2000  # from the first import to the first processed block
+
+FIRST_BLOCK_CODE = '''
+import time
+start = time.perf_counter()
+import numpy as np
+import Registry
+effect = Registry.effects_dict[%r](200, 8000)
+effect.cal_output(np.zeros(1024))
+print((time.perf_counter() - start) * 1000)
+'''
+
+
+def import_time(module):
+    """
+    cumulative import time of a module in a fresh interpreter
+
+    @param str module: module name
+    @return float ms: import time in ms, None if the module cannot be imported
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000
+    return None
+
+
+def first_block_time(effect_name):
+    """
+    time from the first import in a fresh interpreter until the first block is
+    processed
+
+    @param str effect_name: name in the effect registry
+    @return float ms: time in ms
+    """
+    result = subprocess.run([sys.executable, '-c', FIRST_BLOCK_CODE % effect_name],
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+if __name__ == '__main__':
+    over_budget = False
+
+    print('python -X importtime, cumulative:')
+    for module in ('Registry', 'Effects', 'UI_menu', 'UI_effects'):
+        ms = import_time(module)
+        budget = IMPORT_BUDGET.get(module)
+        if ms is None:
+            print('  %-12s not importable here' % module)
+            continue
+        status = ''
+        if budget is not None:
+            status = 'ok' if ms <= budget else 'OVER BUDGET (%d ms)' % budget
+            over_budget |= ms > budget
+        print('  %-12s %8.1f ms  %s' % (module, ms, status))
+
+    print('time to first audio block:')
+    for effect_name in ('NoEffect', 'PitchShift'):
+        ms = first_block_time(effect_name)
+        over_budget |= ms > FIRST_BLOCK_BUDGET
+        print('  %-12s %8.1f ms  %s' % (effect_name, ms, 'ok' if ms <= FIRST_BLOCK_BUDGET
+                                        else 'OVER BUDGET (%d ms)' % FIRST_BLOCK_BUDGET))
+
+    sys.exit(1 if over_budget else 0)
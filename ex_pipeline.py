@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+
+import Effects
+import Pipeline
+
+# compare a long effect chain run serially and as a pipeline (one worker per effect)
+RATE = 8000
+BLOCKLEN = 1024
+
+
+def make_stages():
+    return [Effects.PitchShift(200, RATE, ratio=1.3, formant=1),
+            Effects.Autobots(200, RATE),
+            Effects.Vibrato(2, RATE),
+            Effects.ComplexAM(300, RATE)]
+
+
+def run(effect, blocks):
+    start = time.perf_counter()
+    for block in blocks:
+        effect.cal_output(block)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    blocks = np.random.randn(200, BLOCKLEN) * 3000
+    audio_time = blocks.size / RATE
+
+    serial = run(Pipeline.Chain(make_stages()), blocks)
+    print('serial:    %.1fx real time' % (audio_time / serial))
+    for use_processes in (False, True):
+        pipeline = Pipeline.PipelineExecutor(make_stages(), use_processes=use_processes,
+                                             blocklen=BLOCKLEN)
+        elapsed = run(pipeline, blocks)
+        pipeline.close()
+        print('%-10s %.1fx real time, %d blocks (%.0f ms) of added latency'
+              % ('processes:' if use_processes else 'threads:', audio_time / elapsed,
+                 pipeline.delay_blocks, 1000 * pipeline.delay_blocks * BLOCKLEN / RATE))
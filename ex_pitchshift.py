@@ -0,0 +1,8 @@
+import numpy as np
+import Effects
+from ex_template import mic_in_spkr_out
+
+# shift the voice up by a fifth and keep the formants in place
+ratio = 1.5
+
+mic_in_spkr_out(Effects.PitchShift, frequency=np.array(200), ratio=ratio, formant=1)
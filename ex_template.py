@@ -1,22 +1,28 @@
 import numpy as np
-import struct
 import pyaudio
 
+import Activity
+import Recorder
 
-def mic_in_spkr_out(effect_class, frequency, duration=5, **kwargs):
+
+def mic_in_spkr_out(effect_class, frequency, duration=5, low_latency=False,
+                    record_path=None, record_dry=False, **kwargs):
     """
     play the specified effect using microphone input and will output to speaker
 
     @param Effect effect_class: the filter of type Effect
     @param np.array frequency: frequencies of the filter
     @param int duration: the duration of the time
+    @param bool low_latency: use short blocks (8 ms) instead of 128 ms blocks
+    @param str record_path: optional, record the output to this WAV file
+    @param bool record_dry: also record the input, as the second channel
     @param **kwargs: other kwargs for specific effects
 
     @return: None
     """
 
     # sound properties
-    BLOCKLEN = 1024  # Number of frames per block
+    BLOCKLEN = 64 if low_latency else 1024  # Number of frames per block
     WIDTH = 2  # Bytes per sample
     CHANNELS = 1  # Number of channels
     RATE = 8000  # Sampling rate in Hz (samples/second)
@@ -24,6 +30,8 @@ def mic_in_spkr_out(effect_class, frequency, duration=5, **kwargs):
     # implement effect
     effect = effect_class(frequency, RATE, **kwargs)
     print(type(effect))
+    # skip the processing while nobody is speaking
+    effect = Activity.IdleBypass(effect)
 
     # Open the audio output stream
     p = pyaudio.PyAudio()
@@ -32,25 +40,36 @@ def mic_in_spkr_out(effect_class, frequency, duration=5, **kwargs):
                     rate=RATE,
                     input=True,
                     output=True,
-                    frames_per_buffer=256)
+                    frames_per_buffer=BLOCKLEN)
+
+    recorder = None
+    if record_path is not None:
+        recorder = Recorder.SessionRecorder(record_path, RATE, dry=record_dry)
 
     print('start playing for %f seconds ...' % duration)
 
     # Loop through blocks
     for i in range(int(duration * RATE / BLOCKLEN)):
         input_bytes = stream.read(BLOCKLEN, exception_on_overflow=False)
-        x = struct.unpack('h' * BLOCKLEN, input_bytes)
+        x = np.frombuffer(input_bytes, dtype=np.int16).astype(effect.dtype)
         y = effect.cal_output(x)
 
-        y = np.clip(np.array(y, np.int), -32768, 32767)
+        y = np.clip(y, -32768, 32767)
 
-        # Convert numeric list to binary data
-        output_bytes = struct.pack('h' * BLOCKLEN, *y)
+        # Convert numeric array to binary data
+        output_bytes = np.asarray(y).astype(np.int16).tobytes()
 
         # Write binary data to audio output stream
         stream.write(output_bytes, BLOCKLEN)
 
+        if recorder is not None:
+            recorder.write(y, x)
+
     print('* Finished')
+    if recorder is not None:
+        dropped = recorder.stop()
+        if dropped:
+            print('%d blocks could not be recorded, the disk was too slow' % dropped)
 
     stream.stop_stream()
     stream.close()